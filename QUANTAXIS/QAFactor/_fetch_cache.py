@@ -0,0 +1,109 @@
+"""
+网络查询结果缓存
+1. 内存缓存：最近读取的结果保存在进程内 (LRU)
+2. 磁盘缓存：查询结果以 pickle 格式保存在 ~/.quantaxis/cache/fetch_cache 目录下，
+   文件名为查询参数的哈希值，超过有效期的缓存视为失效
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+from QUANTAXIS.QASetting.QALocalize import cache_path
+
+FETCH_CACHE_PATH = os.path.join(cache_path, "fetch_cache")
+# 财报存在修正的情况，缓存默认一天后失效
+FETCH_CACHE_EXPIRE = 24 * 60 * 60
+
+# 内存缓存按条目数与占用内存双重限制
+MEMORY_CACHE_MAXSIZE = 32
+MEMORY_CACHE_MAXBYTES = 256 * 1024 * 1024
+
+os.makedirs(FETCH_CACHE_PATH, exist_ok=True)
+
+# key -> (mtime, nbytes, df)
+_memory_cache = OrderedDict()
+_memory_cache_bytes = 0
+_memory_cache_lock = threading.Lock()
+
+
+def cache_key(**params) -> str:
+    """根据查询参数生成缓存键值"""
+    return hashlib.blake2b(
+        json.dumps(sorted(params.items()), default=str).encode()).hexdigest()
+
+
+def _cache_file(key: str) -> str:
+    return os.path.join(FETCH_CACHE_PATH, f"{key}.pkl")
+
+
+def _cache_load(key: str, path: str, mtime: float) -> pd.DataFrame:
+    """优先从内存缓存读取，磁盘文件更新 (mtime 变化) 后替换对应的内存缓存"""
+    global _memory_cache_bytes
+    with _memory_cache_lock:
+        item = _memory_cache.get(key)
+        if item is not None and item[0] == mtime:
+            _memory_cache.move_to_end(key)
+            return item[2]
+    df = pd.read_pickle(path)
+    nbytes = int(df.memory_usage(deep=True).sum())
+    with _memory_cache_lock:
+        item = _memory_cache.pop(key, None)
+        if item is not None:
+            _memory_cache_bytes -= item[1]
+        if nbytes <= MEMORY_CACHE_MAXBYTES:
+            _memory_cache[key] = (mtime, nbytes, df)
+            _memory_cache_bytes += nbytes
+        while (len(_memory_cache) > MEMORY_CACHE_MAXSIZE) or (_memory_cache_bytes > MEMORY_CACHE_MAXBYTES):
+            _memory_cache_bytes -= _memory_cache.popitem(last=False)[1][1]
+    return df
+
+
+def cache_get(key: str, expire: float = FETCH_CACHE_EXPIRE) -> pd.DataFrame:
+    """读取缓存，缓存不存在或者已经失效时返回 None
+
+    Args:
+        key (str): 缓存键值
+        expire (float, optional): 有效期 (秒)，为 None 时永不失效. 默认为 FETCH_CACHE_EXPIRE.
+
+    Returns:
+        pd.DataFrame: 缓存的查询结果
+    """
+    path = _cache_file(key)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    if (expire is not None) and (time.time() - mtime > expire):
+        return None
+    try:
+        return _cache_load(key, path, mtime).copy()
+    except Exception:
+        return None
+
+
+def cache_set(key: str, df: pd.DataFrame):
+    """保存查询结果，空数据不做缓存
+
+    Args:
+        key (str): 缓存键值
+        df (pd.DataFrame): 查询结果
+    """
+    if df is None or df.empty:
+        return
+    path = _cache_file(key)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        df.to_pickle(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        # 写入失败时清理未完成的临时文件
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
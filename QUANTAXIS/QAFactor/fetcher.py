@@ -5,6 +5,8 @@
     - QA_fetch_get_individual_financial: 查询个股指定时间段指定财务报表指定报告类型数据
 2. 截面查询
     - QA_fetch_get_crosssection_financial: 查询指定报告期指定报表指定报告类型数据
+3. 批量查询
+    - QA_fetch_get_financial_batch: 查询股票列表指定报告期列表指定报表指定报告类型数据
 本地查询接口：
 1. 截面查询
     - QA_fetch_crosssection_financial
@@ -12,7 +14,11 @@
     - QA_fetch_financial_adv
 """
 
+import asyncio
+import concurrent.futures
 import datetime
+import functools
+import threading
 import time
 from typing import List, Tuple, Union
 
@@ -20,16 +26,136 @@ import pandas as pd
 import pymongo
 import tushare as ts
 
-from QUANTAXIS.QAFactor.utils import QA_fmt_code, QA_fmt_code_list
+from QUANTAXIS.QAFactor._fetch_cache import cache_get, cache_key, cache_set
+from QUANTAXIS.QAFactor.utils import (QA_fmt_code, QA_fmt_code_list,
+                                      _date_stamp, _date_stamp_before)
 from QUANTAXIS.QAFetch.QAQuery_Advance import QA_fetch_stock_list
 from QUANTAXIS.QAFetch.QATushare import get_pro
 from QUANTAXIS.QAUtil import (DATABASE, QASETTING, QA_util_date_int2str,
-                              QA_util_date_stamp, QA_util_log_info,
-                              QA_util_to_json_from_pandas)
+                              QA_util_log_info, QA_util_to_json_from_pandas)
 
 REPORT_DATE_TAILS = ["0331", "0630", "0930", "1231"]
 SHEET_TYPE = ["income", "balancesheet", "cashflow"]
 REPORT_TYPE = ['1', '2', '3', '4', '5', '11']
+# 超频错误的重试次数上限为 max_trial 的倍数
+QUOTA_TRIAL_RATIO = 5
+FINANCIAL_INDEX = [
+    ("code", pymongo.ASCENDING),
+    ("report_type", pymongo.ASCENDING),
+    ("f_ann_date_stamp", pymongo.ASCENDING),
+    ("report_date_stamp", pymongo.ASCENDING)]
+
+
+class TushareBucket:
+    """tushare 接口访问频率限制 (令牌桶)，tushare 按每分钟访问次数限流，
+       并发请求共享同一个令牌桶，按 rate / per 的速度匀速发放访问许可，
+       超频时暂停发放至下一个统计周期
+
+    Args:
+        rate (int, optional): 每个周期允许的访问次数，与 tushare 账号积分等级相关，
+            可通过 set_rate 调整. 默认为 200.
+        per (float, optional): 周期长度 (秒). 默认为 60.
+        burst (int, optional): 允许的突发访问次数. 默认为 1.
+    """
+
+    QUOTA_ERROR_MSG = "每分钟最多访问"
+
+    def __init__(self, rate: int = 200, per: float = 60.0, burst: int = 1):
+        self.rate = rate
+        self.per = per
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def set_rate(self, rate: int, per: float = None):
+        """调整访问频率，如 TUSHARE_BUCKET.set_rate(500)"""
+        with self._lock:
+            self._refill()
+            self.rate = rate
+            if per:
+                self.per = per
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.burst, self._tokens + (now - self._last) * self.rate / self.per)
+        self._last = now
+
+    def acquire(self):
+        """获取一次访问许可，令牌不足时等待至下一个令牌补充"""
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) * self.per / self.rate
+            time.sleep(wait)
+
+    def penalize(self):
+        """接口返回超频错误时，暂停发放令牌一个完整周期，等待 tushare 的统计窗口重置"""
+        with self._lock:
+            self._refill()
+            # 并发请求同时超频时不重复累加等待时间
+            self._tokens = min(self._tokens, -float(self.rate))
+
+    @classmethod
+    def is_quota_error(cls, e: Exception) -> bool:
+        return cls.QUOTA_ERROR_MSG in str(e)
+
+
+TUSHARE_BUCKET = TushareBucket()
+
+
+@functools.lru_cache(maxsize=64)
+def _valid_report_dates(year: int) -> frozenset:
+    """指定年份的标准报告期 (格式为 "%Y%m%d")"""
+    return frozenset(f"{year}{tail}" for tail in REPORT_DATE_TAILS)
+
+
+@functools.lru_cache(maxsize=1)
+def _pro():
+    """复用 tushare pro 接口，避免每次查询重复读取配置与初始化"""
+    return get_pro()
+
+
+@functools.lru_cache(maxsize=None)
+def _ensure_financial_index(sheet_type: str) -> bool:
+    """确保财务报表存在常用查询对应的复合索引，每个报表每个进程仅检查一次，返回索引是否可用"""
+    try:
+        getattr(DATABASE, sheet_type).create_index(
+            FINANCIAL_INDEX, background=True)
+        return True
+    except pymongo.errors.PyMongoError as e:
+        QA_util_log_info(e)
+        return False
+
+
+def _cache_set(key: str, df: pd.DataFrame):
+    """写入查询缓存，缓存写入失败只记录日志，不影响查询结果"""
+    try:
+        cache_set(key, df)
+    except Exception as e:
+        QA_util_log_info(f"[CACHE ERROR]\t{e}")
+
+
+def _projection(fields: Union[Tuple, List] = None) -> dict:
+    """构造 mongo 查询的字段投影，由数据库端过滤字段，仅返回需要的字段"""
+    projection = {"_id": 0}
+    if fields:
+        projection.update({field: 1 for field in fields})
+    return projection
+
+
+def _run_coroutine(coro):
+    """在同步接口中执行协程，如果当前线程已有运行中的事件循环 (如 jupyter)，则在新线程中执行"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
 
 
 def QA_fetch_get_individual_financial(
@@ -41,7 +167,9 @@ def QA_fetch_get_individual_financial(
         report_type: Union[int, str] = 1,
         fields: Union[str, Tuple, List] = None,
         wait_seconds: int = 61,
-        max_trial: int = 3) -> pd.DataFrame:
+        max_trial: int = 3,
+        concurrency: int = 4,
+        use_cache: bool = True) -> pd.DataFrame:
     """个股财务报表网络查询接口，注意，这里的 start 与 end 是针对 report_date 进行范围查询
 
     Args:
@@ -69,31 +197,112 @@ def QA_fetch_get_individual_financial(
             11 调整前合并报表	调整之前合并报表原数据 |
             12 母公司调整前报表	母公司报表发生变更前保留的原数据)
         fields (Union[str, Tuple, List], optional): 指定数据范围，如果设置为 None，则返回所有数据. 默认为 None.
-        wait_seconds (int, optional): 等待重试时间. 默认为 61 秒.
+        wait_seconds (int, optional): 非超频错误的等待重试时间，超频时由 TUSHARE_BUCKET 控制等待. 默认为 61 秒.
         max_trial (int, optional): 最大重试次数. 默认为 3.
+        concurrency (int, optional): 同时进行查询的报告期数量上限. 默认为 4.
+        use_cache (bool, optional): 是否使用本地缓存的查询结果. 默认为 True.
 
     Returns:
         pd.DataFrame: 返回指定个股时间范围内指定类型的报表数据
     """
-    def _get_individual_financial(code, report_date, report_type, sheet_type, fields, wait_seconds, trial_count):
-        nonlocal pro, max_trial
-        if trial_count >= max_trial:
-            raise ValueError("[ERROR]\tEXCEED MAX TRIAL!")
+    def _get_individual_financial(code, report_date, report_type, sheet_type, fields, wait_seconds, abort):
+        kwargs = {"ts_code": code, "period": report_date,
+                  "report_type": report_type, "fields": fields}
+        key = cache_key(api=sheet_type, **kwargs)
+        if use_cache:
+            df = cache_get(key)
+            if df is not None:
+                return df
+        trial_count = 0
+        quota_trial = 0
+        while trial_count < max_trial:
+            TUSHARE_BUCKET.acquire()
+            # 其他报告期查询失败时不再继续请求
+            if abort.is_set():
+                raise ValueError("[ERROR]\tQUERY ABORTED!")
+            try:
+                df = getattr(_pro(), sheet_type)(
+                    **{k: v for k, v in kwargs.items() if v})
+            except Exception as e:
+                print(e)
+                if TUSHARE_BUCKET.is_quota_error(e):
+                    # 超出频率限制，等待统计周期重置后重试，单独计数，避免配额持续耗尽时无限重试
+                    quota_trial += 1
+                    if quota_trial >= max_trial * QUOTA_TRIAL_RATIO:
+                        break
+                    TUSHARE_BUCKET.penalize()
+                    continue
+                trial_count += 1
+                # 重试时重新初始化 tushare 接口
+                _pro.cache_clear()
+                if trial_count < max_trial:
+                    abort.wait(wait_seconds)
+                continue
+            _cache_set(key, df)
+            return df
+        raise ValueError("[ERROR]\tEXCEED MAX TRIAL!")
+
+    async def _get_individual_financial_async(executor, abort, semaphore, queue, idx, code, report_date, report_type, sheet_type, fields, wait_seconds):
+        # tushare 接口为阻塞调用，放入线程池执行，通过 semaphore 控制并发数量，避免超出接口频率限制
+        async with semaphore:
+            loop = asyncio.get_running_loop()
+            df = await loop.run_in_executor(executor, functools.partial(
+                _get_individual_financial,
+                code=code,
+                report_date=report_date,
+                report_type=report_type,
+                sheet_type=sheet_type,
+                fields=fields,
+                wait_seconds=wait_seconds,
+                abort=abort))
+        await queue.put((idx, df))
+
+    async def _consume_individual_financial(queue):
+        # 数据处理与网络查询同时进行
+        frames = {}
+        while True:
+            item = await queue.get()
+            if item is None:
+                # 按报告期顺序返回，与查询完成的先后无关
+                return [frames[idx] for idx in sorted(frames)]
+            idx, df = item
+            if not df.empty:
+                frames[idx] = df.rename(
+                    columns={"ts_code": "code", "end_date": "report_date"})
+
+    async def _get_individual_financials(report_dates):
+        semaphore = asyncio.Semaphore(concurrency)
+        queue = asyncio.Queue(maxsize=8)
+        # 使用独立线程池，查询失败时无需等待其他线程中的重试结束
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=concurrency)
+        abort = threading.Event()
+        consumer = asyncio.ensure_future(_consume_individual_financial(queue))
+        tasks = [asyncio.ensure_future(_get_individual_financial_async(
+            executor=executor,
+            abort=abort,
+            semaphore=semaphore,
+            queue=queue,
+            idx=idx,
+            code=QA_fmt_code(code, "ts"),
+            report_date=report_date.strftime("%Y%m%d"),
+            report_type=report_type,
+            sheet_type=sheet_type,
+            fields=fields,
+            wait_seconds=wait_seconds)) for idx, report_date in enumerate(report_dates)]
         try:
-            if not fields:
-                df = eval(
-                    f"pro.{sheet_type}(ts_code='{code}', period='{report_date}', report_type={report_type})")
-            else:
-                df = eval(
-                    f"pro.{sheet_type}(ts_code='{code}', period='{report_date}', report_type={report_type}, fields={fields})")
-            return df.rename(columns={"ts_code": "code", "end_date": "report_date"})
-        except Exception as e:
-            print(e)
-            time.sleep(wait_seconds)
-            _get_individual_financial(
-                code, report_date, report_type, sheet_type, fields, wait_seconds, trial_count+1)
-
-    pro = get_pro()
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # 任一报告期查询失败时，通知正在执行的查询停止重试，并取消尚未开始的查询
+            abort.set()
+            for task in tasks:
+                task.cancel()
+            consumer.cancel()
+            raise
+        finally:
+            executor.shutdown(wait=False)
+        await queue.put(None)
+        return await consumer
+
     report_type = int(report_type)
     if (not start) and (not end) and (not report_date):
         raise ValueError(
@@ -103,10 +312,7 @@ def QA_fetch_get_individual_financial(
                                   "ann_date", "f_ann_date", "report_type", "update_flag"])))
     if report_date:
         report_date = pd.Timestamp(report_date)
-        year = report_date.year
-        report_date_lists = [
-            pd.Timestamp(str(year) + report_date_tail) for report_date_tail in REPORT_DATE_TAILS]
-        if report_date not in report_date_lists:
+        if report_date.strftime("%Y%m%d") not in _valid_report_dates(report_date.year):
             raise ValueError("[REPORT_DATE ERROR]")
         if sheet_type not in ["income", "balancesheet", "cashflow", "forecast", "express"]:
             raise ValueError("[SHEET_TYPE ERROR]")
@@ -114,26 +320,13 @@ def QA_fetch_get_individual_financial(
             raise ValueError("[REPORT_TYPE ERROR]")
         report_dates = [report_date]
     else:
-        start = pd.Timestamp(start)
-        start_year = start.year
-        end = pd.Timestamp(end)
-        end_year = end.year
-        origin_year_ranges = pd.date_range(
-            str(start_year), str(end_year+1), freq='Y').map(str).str.slice(0, 4).tolist()
-        origin_report_ranges = pd.Series([
-            pd.Timestamp(year + report_date_tail) for year in origin_year_ranges for report_date_tail in REPORT_DATE_TAILS])
-        report_dates = origin_report_ranges.loc[(
-            origin_report_ranges >= start) & (origin_report_ranges <= end)]
-    df = pd.DataFrame()
-    for report_date in report_dates:
-        df = df.append(_get_individual_financial(
-            code=QA_fmt_code(code, "ts"),
-            report_date=report_date.strftime("%Y%m%d"),
-            report_type=report_type,
-            sheet_type=sheet_type,
-            fields=fields,
-            wait_seconds=wait_seconds,
-            trial_count=0))
+        # 报告期即为 start 与 end 之间的各季度末
+        report_dates = pd.date_range(
+            pd.Timestamp(start), pd.Timestamp(end), freq="Q", normalize=True)
+    frames = _run_coroutine(_get_individual_financials(report_dates))
+    if not frames:
+        return pd.DataFrame()
+    df = pd.concat(frames, ignore_index=True, copy=False)
     df.code = QA_fmt_code_list(df.code)
     return df.reset_index(drop=True)
 
@@ -144,7 +337,8 @@ def QA_fetch_get_crosssection_financial(
         sheet_type: str = "income",
         fields: Union[str, Tuple, List] = None,
         wait_seconds: int = 61,
-        max_trial: int = 3) -> pd.DataFrame:
+        max_trial: int = 3,
+        use_cache: bool = True) -> pd.DataFrame:
     """截面财务报表网络查询接口
 
     Args:
@@ -170,47 +364,57 @@ def QA_fetch_get_crosssection_financial(
              业绩预告 "forecast"|
              业绩快报 "express")
         fields (Union[str, List], optional): 数据范围，默认为 None，返回所有数据.
-        wait_seconds (int, optional): 查询超时时间, 默认为 61.
+        wait_seconds (int, optional): 非超频错误的等待重试时间，超频时由 TUSHARE_BUCKET 控制等待, 默认为 61.
         max_trial (int, optional): 查询最大尝试次数, 默认为 3.
+        use_cache (bool, optional): 是否使用本地缓存的查询结果, 默认为 True.
 
     Returns:
         pd.DataFrame: 指定报告期的指定财务报表数据
     """
-    def _get_crosssection_financial(report_date, report_type, sheet_type, fields, wait_seconds, trial_count):
-        nonlocal pro, max_trial
-        if trial_count >= max_trial:
-            raise ValueError("[ERROR]\tEXCEED MAX TRIAL!")
-        try:
-            if not fields:
-                print(
-                    f"pro.{sheet_type}_vip(period='{report_date}', report_type={report_type})")
-                df = eval(
-                    f"pro.{sheet_type}_vip(period='{report_date}', report_type={report_type})")
-            else:
-                df = eval(
-                    f"pro.{sheet_type}_vip(period='{report_date}', report_type={report_type}, fields={fields})")
+    def _get_crosssection_financial(report_date, report_type, sheet_type, fields, wait_seconds):
+        kwargs = {"period": report_date,
+                  "report_type": report_type, "fields": fields}
+        key = cache_key(api=f"{sheet_type}_vip", **kwargs)
+        if use_cache:
+            df = cache_get(key)
+            if df is not None:
+                return df
+        trial_count = 0
+        quota_trial = 0
+        while trial_count < max_trial:
+            TUSHARE_BUCKET.acquire()
+            try:
+                df = getattr(_pro(), f"{sheet_type}_vip")(
+                    **{k: v for k, v in kwargs.items() if v})
+            except Exception as e:
+                print(e)
+                if TUSHARE_BUCKET.is_quota_error(e):
+                    # 超出频率限制，等待统计周期重置后重试，单独计数，避免配额持续耗尽时无限重试
+                    quota_trial += 1
+                    if quota_trial >= max_trial * QUOTA_TRIAL_RATIO:
+                        break
+                    TUSHARE_BUCKET.penalize()
+                    continue
+                trial_count += 1
+                # 重试时重新初始化 tushare 接口
+                _pro.cache_clear()
+                if trial_count < max_trial:
+                    time.sleep(wait_seconds)
+                continue
             if df.empty:
                 return df
             df.ts_code = QA_fmt_code_list(df.ts_code)
-            return df.rename(columns={"ts_code": "code", "end_date": "report_date"}).sort_values(by=['ann_date', 'f_ann_date'])
-        except Exception as e:
-            print(e)
-            time.sleep(wait_seconds)
-            _get_crosssection_financial(
-                report_date, report_type, sheet_type, fields, wait_seconds, trial_count + 1)
-
-    # Tushare 账号配置
-    pro = get_pro()
+            df = df.rename(columns={"ts_code": "code", "end_date": "report_date"}).sort_values(by=['ann_date', 'f_ann_date'])
+            _cache_set(key, df)
+            return df
+        raise ValueError("[ERROR]\tEXCEED MAX TRIAL!")
 
     # 设置标准报告期格式
     report_date = pd.Timestamp(report_date)
     report_type = int(report_type)
-    year = report_date.year
-    std_report_dates = [
-        str(year) + report_date_tail for report_date_tail in REPORT_DATE_TAILS]
 
     # Tushare 接口支持的日期格式
-    if report_date.strftime("%Y%m%d") not in std_report_dates:
+    if report_date.strftime("%Y%m%d") not in _valid_report_dates(report_date.year):
         raise ValueError("[REPORT_DATE ERROR]")
 
     # fields 格式化处理
@@ -229,8 +433,59 @@ def QA_fetch_get_crosssection_financial(
         report_type=report_type,
         sheet_type=sheet_type,
         fields=fields,
-        wait_seconds=wait_seconds,
-        trial_count=0)
+        wait_seconds=wait_seconds)
+
+
+def QA_fetch_get_financial_batch(
+        codes: Union[str, Tuple, List],
+        report_dates: Union[str, datetime.datetime, pd.Timestamp, Tuple, List],
+        report_type: Union[int, str] = 1,
+        sheet_type: str = "income",
+        fields: Union[str, Tuple, List] = None,
+        wait_seconds: int = 61,
+        max_trial: int = 3,
+        use_cache: bool = True) -> pd.DataFrame:
+    """股票列表财务报表网络批量查询接口，每个报告期只通过截面接口查询一次，再在本地按股票代码筛选，
+       多只股票查询时，网络请求次数由 股票数量 x 报告期数量 减少为 报告期数量
+
+    Args:
+        codes (Union[str, Tuple, List]): 股票代码或列表
+        report_dates (Union[str, datetime.datetime, pd.Timestamp, Tuple, List]): 报告期或报告期列表
+        report_type (Union[int, str], optional): 报告类型，默认值为 1.
+        sheet_type (str, optional): 报表类型，默认为 "income".
+        fields (Union[str, Tuple, List], optional): 数据范围，默认为 None，返回所有数据.
+        wait_seconds (int, optional): 非超频错误的等待重试时间，超频时由 TUSHARE_BUCKET 控制等待, 默认为 61.
+        max_trial (int, optional): 查询最大尝试次数, 默认为 3.
+        use_cache (bool, optional): 是否使用本地缓存的查询结果, 默认为 True.
+
+    Returns:
+        pd.DataFrame: 指定股票列表指定报告期的指定财务报表数据
+    """
+    codes = QA_fmt_code_list(codes)
+    # 本地按股票代码筛选与排序需要基础字段
+    if isinstance(fields, str):
+        fields = [fields]
+    if fields:
+        fields = sorted(list(set(list(fields) + ["ts_code", "end_date",
+                                                 "ann_date", "f_ann_date", "report_type", "update_flag"])))
+    if isinstance(report_dates, (str, datetime.datetime, pd.Timestamp)):
+        report_dates = [report_dates]
+    frames = []
+    for report_date in report_dates:
+        df = QA_fetch_get_crosssection_financial(
+            report_date=report_date,
+            report_type=report_type,
+            sheet_type=sheet_type,
+            fields=fields,
+            wait_seconds=wait_seconds,
+            max_trial=max_trial,
+            use_cache=use_cache)
+        if df is None or df.empty:
+            continue
+        frames.append(df.loc[df.code.isin(codes)])
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True, copy=False)
 
 
 def QA_fetch_crosssection_financial(
@@ -259,20 +514,21 @@ def QA_fetch_crosssection_financial(
     if isinstance(fields, str):
         fields = sorted(list(set([fields, "code", "report_date",
                                   "ann_date", "f_ann_date", "report_type", "update_flag"])))
-    coll = eval(f"DATABASE.{sheet_type}")
+    coll = getattr(DATABASE, sheet_type)
     report_date = pd.Timestamp(report_date).strftime("%Y%m%d")
     cursor = coll.find(
         {
             "report_date": report_date,
             "report_type": str(report_type)
-        }
+        },
+        projection=_projection(fields)
     )
-    res = pd.DataFrame([item for item in cursor])
+    res = pd.DataFrame.from_records(cursor, columns=fields)
     if res.empty:
         return pd.DataFrame()
-    if not fields:
-        return res.drop(columns="_id")
-    return res.drop(columns="_id")[fields]
+    if "code" in res.columns:
+        res["code"] = res["code"].astype("category")
+    return res
 
 
 def QA_fetch_financial_adv(
@@ -315,15 +571,15 @@ def QA_fetch_financial_adv(
     else:
         report_type = list(map(str, report_type))
 
-    coll = eval(f"DATABASE.{sheet_type}")
+    coll = getattr(DATABASE, sheet_type)
     qry = {}
     if not report_date:
         if not end:
             end = datetime.date.today()
         start = pd.Timestamp(start)
         end = pd.Timestamp(end)
-        start_date_stamp = QA_util_date_stamp(start)
-        end_date_stamp = QA_util_date_stamp(end)
+        start_date_stamp = _date_stamp(start)
+        end_date_stamp = _date_stamp(end)
         if not code:
             qry = {
                 "f_ann_date_stamp": {
@@ -348,7 +604,7 @@ def QA_fetch_financial_adv(
                 }
             }
     else:
-        report_date_stamp = QA_util_date_stamp(report_date)
+        report_date_stamp = _date_stamp(report_date)
         if not code:
             qry = {
                 "report_date_stamp": report_date_stamp,
@@ -373,13 +629,16 @@ def QA_fetch_financial_adv(
         fields = list(
             set(list(fields) + ["code", "ann_date", "report_date", "f_ann_date"]))
 
-    cursor = coll.find(qry, batch_size=10000).sort([
+    cursor = coll.find(qry, projection=_projection(fields), batch_size=10000).sort([
         ("report_date_stamp", pymongo.ASCENDING),
         ("f_ann_date_stamp", pymongo.ASCENDING)])
-    if fields:
-        return pd.DataFrame(cursor).drop(columns="_id")[fields].set_index("code")
-    else:
-        return pd.DataFrame(cursor).drop(columns="_id").set_index("code")
+    # 指定股票时强制使用复合索引，不指定股票时交由查询优化器选择，避免全索引扫描
+    if code and _ensure_financial_index(sheet_type):
+        cursor = cursor.hint(FINANCIAL_INDEX)
+    df = pd.DataFrame.from_records(cursor, columns=fields)
+    # 股票代码重复度高，转换为 category 类型节省内存，并加快按股票分组
+    df["code"] = df["code"].astype("category")
+    return df.set_index("code")
 
 
 def QA_fetch_last_financial(
@@ -425,7 +684,7 @@ def QA_fetch_last_financial(
                 raise ValueError("[REPORT_TYPE ERROR]")
             report_type = (report_type,)
         else:
-            report_type = list(set(report_type) & set('1', '4', '5'))
+            report_type = list(set(map(str, report_type)) & set(('1', '4', '5')))
 
     if sheet_type not in SHEET_TYPE:
         raise ValueError(f"[SHEET_TYPE ERROR]")
@@ -437,99 +696,54 @@ def QA_fetch_last_financial(
             set([fields, "code", "ann_date", "report_date", "f_ann_date"]))
     elif fields:
         fields = list(
-            set(fields + ["code", "ann_date", "report_date", "f_ann_date"]))
+            set(list(fields) + ["code", "ann_date", "report_date", "f_ann_date"]))
 
-    coll = eval(f"DATABASE.{sheet_type}")
-    if (not code) and (not report_label):
-        # 为了加快检索速度，从当前日期往前至多回溯一季度，实际调仓时，仅考虑当前能拿到的最新数据，调仓周期一般以月, 季为单位，
-        # 最长一般为年报，而修正报表如果超过 1 个季度，基本上怼调仓没有影响，这里以 1 年作为回溯基准
-        qry = {
-            "f_ann_date_stamp": {
-                "$gt": QA_util_date_stamp((pd.Timestamp(cursor_date) - pd.Timedelta(days=400)).strftime("%Y-%m-%d")),
-                "$lt": QA_util_date_stamp(cursor_date)
-            },
-            "report_type": {
-                "$in": report_type
-            }}
-        cursor = coll.find(qry, batch_size=10000).sort([
-            ("report_date_stamp", pymongo.DESCENDING),
-            ("f_ann_date_stamp", pymongo.DESCENDING)])
-        try:
-            if not fields:
-                df = pd.DataFrame(cursor).drop(columns="_id")
-            else:
-                df = pd.DataFrame(cursor).drop(columns="_id")[fields]
-        except:
-            raise ValueError("[QRY ERROR]")
-        return df.groupby("code").apply(lambda x: x.iloc[0])
-    if not report_label:
-        qry = {
-            "code": {
-                "$in": code
-            },
-            "f_ann_date_stamp": {
-                "$gt": QA_util_date_stamp((pd.Timestamp(cursor_date) - pd.Timedelta(days=400)).strftime("%Y-%m-%d")),
-                "$lt": QA_util_date_stamp(cursor_date)
-            },
-            "report_type": {"$in": report_type}}
-        cursor = coll.find(qry, batch_size=10000).sort([
-            ("report_date_stamp", pymongo.DESCENDING),
-            ("f_ann_date_stamp", pymongo.DESCENDING)])
-        try:
-            if not fields:
-                df = pd.DataFrame(cursor).drop(columns="_id")
-            else:
-                df = pd.DataFrame(cursor).drop(columns="_id")[fields]
-        except:
-            raise ValueError("[QRY ERROR]")
-        return df.groupby("code").apply(lambda x: x.iloc[0])
-    if not code:
-        qry = {
-            "f_ann_date_stamp": {
-                "$gt": QA_util_date_stamp((pd.Timestamp(cursor_date) - pd.Timedelta(days=400)).strftime("%Y-%m-%d")),
-                "$lt": QA_util_date_stamp(cursor_date)
-            },
-            "report_type": {
-                "$in": report_type
-            },
-            "report_label": report_label
-        }
-        cursor = coll.find(qry, batch_size=10000).sort([
-            ("report_date_stamp", pymongo.DESCENDING),
-            ("f_ann_date_stamp", pymongo.DESCENDING)])
-        try:
-            if not fields:
-                df = pd.DataFrame(cursor).drop(columns="_id")
-            else:
-                df = pd.DataFrame(cursor).drop(columns="_id")[fields]
-        except:
-            raise ValueError("[QRY ERROR]")
-        return df.groupby("code").apply(lambda x: x.iloc[0])
-    else:
-        qry = {
-            "code": {
-                "$in": code
-            },
-            "f_ann_date_stamp": {
-                "$gt": QA_util_date_stamp((pd.Timestamp(cursor_date) - pd.Timedelta(days=400)).strftime("%Y-%m-%d")),
-                "$lt": QA_util_date_stamp(cursor_date)
-            },
-            "report_type": {
-                "$in": report_type
-            },
-            "report_label": report_label
-        }
-        cursor = coll.find(qry, batch_size=10000).sort([
-            ("report_date_stamp", pymongo.DESCENDING),
-            ("f_ann_date_stamp", pymongo.DESCENDING)])
-        try:
-            if not fields:
-                df = pd.DataFrame(cursor).drop(columns="_id")
-            else:
-                df = pd.DataFrame(cursor).drop(columns="_id")[fields]
-        except:
-            raise ValueError("[QRY ERROR]")
-        return df.groupby("code").apply(lambda x: x.iloc[0])
+    coll = getattr(DATABASE, sheet_type)
+    has_index = _ensure_financial_index(sheet_type)
+    # 为了加快检索速度，从当前日期往前至多回溯一季度，实际调仓时，仅考虑当前能拿到的最新数据，调仓周期一般以月, 季为单位，
+    # 最长一般为年报，而修正报表如果超过 1 个季度，基本上怼调仓没有影响，这里以 1 年作为回溯基准
+    qry = {
+        "f_ann_date_stamp": {
+            "$gt": _date_stamp_before(cursor_date, 400),
+            "$lt": _date_stamp(cursor_date)
+        },
+        "report_type": {
+            "$in": report_type
+        }}
+    if code:
+        qry["code"] = {"$in": code}
+    if report_label:
+        qry["report_label"] = report_label
+    sort = [("report_date_stamp", pymongo.DESCENDING),
+            ("f_ann_date_stamp", pymongo.DESCENDING)]
+
+    def _find_last(c):
+        cursor = coll.find(dict(qry, code=c), projection=_projection(
+            fields)).sort(sort).limit(1)
+        if has_index:
+            cursor = cursor.hint(FINANCIAL_INDEX)
+        return next(cursor, None)
+
+    try:
+        # 在数据库端按股票代码取最新一条记录，避免传输整个回溯窗口的数据
+        cursor = coll.aggregate([
+            {"$match": qry},
+            {"$sort": dict(sort)},
+            {"$group": {"_id": "$code", "doc": {"$first": "$$ROOT"}}},
+            {"$replaceRoot": {"newRoot": "$doc"}},
+            {"$project": _projection(fields)}
+        ], allowDiskUse=True, batchSize=10000)
+        df = pd.DataFrame.from_records(cursor, columns=fields)
+    except pymongo.errors.OperationFailure:
+        # 低版本 MongoDB 不支持上述聚合操作时，按股票代码并行查询最新一条记录
+        codes = code if code else coll.distinct("code", qry)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=32) as executor:
+            docs = [doc for doc in executor.map(_find_last, codes) if doc]
+        df = pd.DataFrame.from_records(docs, columns=fields)
+    if df.empty:
+        raise ValueError("[QRY ERROR]")
+    df["code"] = df["code"].astype("category")
+    return df.set_index("code", drop=False).sort_index()
 
 
 def QA_fetch_stock_basic(
@@ -575,12 +789,12 @@ def QA_fetch_stock_basic(
                     "$in": status
                 }
             }
-    cursor = coll.find(qry)
-    res = pd.DataFrame(cursor)
+    cursor = coll.find(qry, projection={"_id": 0})
+    res = pd.DataFrame.from_records(cursor)
     if res.empty:
         return res
     else:
-        return res.drop(columns="_id").set_index("code")
+        return res.set_index("code")
 
 
 def QA_fetch_stock_name(
@@ -606,10 +820,10 @@ def QA_fetch_stock_name(
         else:
             qry = {
                 "start_date_stamp": {
-                    "$lte": QA_util_date_stamp(cursor_date)
+                    "$lte": _date_stamp(cursor_date)
                 },
                 "end_date_stamp": {
-                    "$gte": QA_util_date_stamp(cursor_date)
+                    "$gte": _date_stamp(cursor_date)
                 }
             }
     else:
@@ -625,18 +839,18 @@ def QA_fetch_stock_name(
                     "$in": code
                 },
                 "start_date_stamp": {
-                    "$lte": QA_util_date_stamp(cursor_date)
+                    "$lte": _date_stamp(cursor_date)
                 },
                 "end_date_stamp": {
-                    "$gte": QA_util_date_stamp(cursor_date)
+                    "$gte": _date_stamp(cursor_date)
                 }
             }
-    cursor = coll.find(qry)
-    res = pd.DataFrame(cursor)
+    cursor = coll.find(qry, projection={"_id": 0})
+    res = pd.DataFrame.from_records(cursor)
     if res.empty:
         return res
     else:
-        return res.drop(columns="_id").set_index("code").sort_values(by="start_date_stamp").drop_duplicates(keep="last").sort_index()
+        return res.set_index("code").sort_values(by="start_date_stamp").drop_duplicates(keep="last").sort_index()
 
 
 def QA_fetch_industry_adv(
@@ -692,17 +906,16 @@ def QA_fetch_industry_adv(
                 },
                 "src": src.lower(),
                 "in_date_stamp": {
-                    "$lte": QA_util_date_stamp(pd.Timestamp(start).strftime("%Y-%m-%d"))
+                    "$lte": _date_stamp(start)
                 }
             }
         if coll.count_documents(filter=qry) < 1:
             print("找不到对应行业数据")
             return pd.DataFrame()
-        cursor = coll.find(qry)
-        df_tmp = pd.DataFrame(cursor).drop(columns="_id")
+        cursor = coll.find(qry, projection={"_id": 0})
+        df_tmp = pd.DataFrame.from_records(cursor)
         if end:
-            df_tmp = df_tmp.loc[df_tmp.out_date_stamp > QA_util_date_stamp(
-                pd.Timestamp(end).strftime("%Y-%m-%d"))]
+            df_tmp = df_tmp.loc[df_tmp.out_date_stamp > _date_stamp(end)]
     else:
         qry = {
             "code": {
@@ -713,16 +926,15 @@ def QA_fetch_industry_adv(
             },
             "src": src.lower(),
             "in_date_stamp": {
-                "$lte": QA_util_date_stamp(pd.Timestamp(cursor_date).strftime("%Y-%m-%d"))
+                "$lte": _date_stamp(cursor_date)
             }
         }
         if coll.count_documents(filter=qry) < 1:
             print("找不到对应行业数据")
             return pd.DataFrame()
-        cursor = coll.find(qry)
-        df_tmp = pd.DataFrame(cursor).drop(columns="_id")
-        df_tmp.loc[df_tmp.out_date_stamp > QA_util_date_stamp(
-            pd.Timestamp(cursor_date).strftime("%Y-%m-%d"))]
+        cursor = coll.find(qry, projection={"_id": 0})
+        df_tmp = pd.DataFrame.from_records(cursor)
+        df_tmp = df_tmp.loc[df_tmp.out_date_stamp > _date_stamp(cursor_date)]
     return df_tmp.drop(columns=["in_date_stamp", "out_date_stamp"])
 
 
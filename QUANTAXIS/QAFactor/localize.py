@@ -57,8 +57,9 @@ def QA_ts_update_all(
             sheet_type=sheet_type,
             wait_seconds=wait_seconds,
             max_trial=max_trial,
+            use_cache=False,
         )
-        coll = eval(f"DATABASE.{sheet_type}")
+        coll = getattr(DATABASE, sheet_type)
         # 考虑到查找的方式，可能根据股票代码查找，可能根据报告期查找，可能根据公告期查找，可能根据最后公告期查找，可能根据报告类型查找
         coll.create_index(
             [
@@ -109,20 +110,7 @@ def QA_ts_update_all(
         end = pd.Timestamp(end)
 
     # 生成报告期列表
-    start_year = start.year
-    end_year = end.year
-    origin_report_dates = pd.Series(
-        [
-            pd.Timestamp(year + date_tail)
-            for year in pd.date_range(str(start_year), str(end_year + 1), freq="1Y")
-            .map(str)
-            .str.slice(0, 4)
-            for date_tail in REPORT_DATE_TAILS
-        ]
-    )
-    report_dates = origin_report_dates.loc[
-        (origin_report_dates >= start) & (origin_report_dates <= end)
-    ]
+    report_dates = pd.date_range(start, end, freq="Q", normalize=True)
 
     # Tushare 接口配置
     pro = get_pro()
@@ -149,7 +137,7 @@ def QA_ts_update_inc(wait_seconds: int = 61, max_trial=3) -> pd.DataFrame:
     ---
     """
     for sheet_type in SHEET_TYPE:
-        coll = eval(f"DATABASE.{sheet_type}")
+        coll = getattr(DATABASE, sheet_type)
         coll.create_index(
             [
                 ("code", ASCENDING),
@@ -209,6 +197,7 @@ def QA_ts_update_inc(wait_seconds: int = 61, max_trial=3) -> pd.DataFrame:
                             sheet_type=sheet_type,
                             wait_seconds=wait_seconds,
                             max_trial=max_trial,
+                            use_cache=False,
                         )
                         df_2 = QA_fetch_crosssection_financial(
                             report_date=report_date,
@@ -347,7 +336,7 @@ def QA_ts_update_stock_basic():
     df_1["status"] = "L"
     df_2["status"] = "P"
     df_3["status"] = "D"
-    df = df_1.append(df_2).append(df_3)
+    df = pd.concat([df_1, df_2, df_3], copy=False)
     df["code"] = QA_fmt_code_list(df.ts_code)
     df["list_date_stamp"] = df.list_date.apply(QA_util_date_stamp)
     df = df.where(pd.notnull(df), None)
@@ -383,18 +372,19 @@ def QA_ts_update_namechange():
     symbol_list = sorted(
         list(set(QA_fmt_code_list(QA_fetch_stock_basic().index.tolist(), "ts")))
     )
-    df = pd.DataFrame()
+    frames = []
     for i, symbol in enumerate(symbol_list):
         if i % 100 == 0:
             print(f"Saving {i}th stock name, stock is {symbol}")
         try:
-            df = df.append(pro.namechange(ts_code=symbol))
+            frames.append(pro.namechange(ts_code=symbol))
         except:
             time.sleep(61)
             try:
-                df = df.append(pro.namechange(ts_code=symbol))
+                frames.append(pro.namechange(ts_code=symbol))
             except:
                 raise ValueError("[ERROR]\t数据获取失败")
+    df = pd.concat(frames, copy=False)
     # df.to_csv("test.csv")
     df["code"] = QA_fmt_code_list(df["ts_code"])
     df["start_date_stamp"] = df["start_date"].apply(QA_util_date_stamp)
@@ -427,30 +417,31 @@ def QA_ts_update_industry(
         level = [level]
     if isinstance(src, str):
         src = [src]
-    df_industry = pd.DataFrame()
+    industry_frames = []
     for s in src:
         for lv in level:
             try:
                 df_tmp = pro.index_classify(level=lv, src=s)
                 df_tmp["src"] = "sw"
-                df_industry = df_industry.append(df_tmp)
+                industry_frames.append(df_tmp)
             except Exception as e1:
                 print(e1)
                 time.sleep(61)
                 try:
                     df_tmp = pro.index_classify(level=lv, src=s)
                     df_tmp["src"] = "sw"
-                    df_industry = df_industry.append(df_tmp)
+                    industry_frames.append(df_tmp)
                 except Exception as e2:
                     raise ValueError(e2)
-    df_results = pd.DataFrame()
+    df_industry = pd.concat(industry_frames, copy=False)
+    result_frames = []
     for idx, item in df_industry.iterrows():
         try:
             df_tmp = pro.index_member(index_code=item["index_code"])
             df_tmp["industry_name"] = item["industry_name"]
             df_tmp["level"] = item["level"].lower()
             df_tmp["src"] = item["src"].lower()
-            df_results = df_results.append(df_tmp)
+            result_frames.append(df_tmp)
         except Exception as e1:
             print(e1)
             time.sleep(61)
@@ -459,9 +450,10 @@ def QA_ts_update_industry(
                 df_tmp["industry_name"] = item["industry_name"]
                 df_tmp["level"] = item["level"].lower()
                 df_tmp["src"] = item["src"].lower()
-                df_results = df_results.append(df_tmp)
+                result_frames.append(df_tmp)
             except Exception as e2:
                 raise ValueError(e2)
+    df_results = pd.concat(result_frames, copy=False)
     df_results.con_code = QA_fmt_code_list(df_results.con_code)
     df_results = df_results.rename(columns={"con_code": "code"})
     df_results = df_results.sort_values(by="code")
@@ -4,8 +4,9 @@
 import datetime
 import math
 import re
+import time
 import warnings
-from functools import partial
+from functools import lru_cache, partial
 from typing import List, Tuple, Union
 
 # import jqdatasdk
@@ -16,6 +17,7 @@ import statsmodels.api as sm
 from QUANTAXIS.QAFactor.parameters import (DAYS_PER_MONTH, DAYS_PER_QUARTER,
                                            DAYS_PER_WEEK, DAYS_PER_YEAR,
                                            FREQUENCE_TYPE)
+from QUANTAXIS.QAUtil import QA_util_date_stamp
 
 
 def get_frequence(frequence: str = None):
@@ -62,6 +64,35 @@ def QA_fmt_quarter(cursor_date: datetime.datetime):
         return pd.Timestamp(cursor_date.year, cursor_date.month, 30)
 
 
+@lru_cache(maxsize=4096)
+def _date_stamp(date) -> float:
+    """
+    带缓存的 QA_util_date_stamp, 回测中同一日期会被反复转换,
+    对于 "%Y-%m-%d" 格式的字符串直接转换，跳过 pd.Timestamp 解析
+
+    ---
+    :param date: 日期 (需可哈希，如 str, datetime, pd.Timestamp)
+    """
+    if isinstance(date, str) and len(date) == 10:
+        try:
+            return time.mktime(time.strptime(date, "%Y-%m-%d"))
+        except ValueError:
+            pass
+    return QA_util_date_stamp(date)
+
+
+@lru_cache(maxsize=4096)
+def _date_stamp_before(date, days: int) -> float:
+    """
+    指定日期往前回溯 days 天对应的时间戳
+
+    ---
+    :param date: 日期 (需可哈希，如 str, datetime, pd.Timestamp)
+    :param days: 回溯天数
+    """
+    return _date_stamp(pd.Timestamp(date) - pd.Timedelta(days=days))
+
+
 def QA_fmt_code(code: str, style: str = None):
     """
     对股票代码格式化处理